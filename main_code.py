@@ -1,6 +1,9 @@
-import json
+import asyncio
+import hashlib
+import orjson
 import os
 import re
+import sqlite3
 import time
 import google.generativeai as genai
 from dotenv import load_dotenv
@@ -10,108 +13,292 @@ load_dotenv()  # Load variables from .env
 api_key = os.getenv("API_KEY")
 genai.configure(api_key=api_key)
 
+# Sent once as the system instruction so the guidelines are not resent
+# (and re-billed) with every batch request
+GUIDELINES = """
+You translate English texts to natural, conversational Hinglish (Hindi-English mix).
+
+Guidelines:
+1. Keep translations natural sounding, not robotic or literal
+2. important : Convert numbers or numerical values to words in 'hindi' words.
+3. Maintain English words that are commonly used in Hinglish conversation
+4. Consider context between sentences for a natural flow
+5. The output should feel like a casual conversation between Indians
+
+The input is one text per line in the format i|text, where i is the text's number.
+Return a JSON array of the Hinglish translations, one per input line, in the same order.
+"""
+
+# Ask Gemini for a parsed JSON array of strings so no response parsing is
+# needed; the SDK converts the list[str] annotation to the response schema
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": list[str],
+}
+
+# Single-item requests skip the numbering/JSON machinery entirely
+SIMPLE_PROMPT = (
+    "Translate the following single text to Hinglish and reply with only the "
+    "translation as plain text, not JSON:\n"
+)
+
+# Compiled once for the fallback parser below; matches both the '[i] text'
+# output format and the 'i|text' numbering the prompts use, since a model
+# that ignores the JSON schema may echo either
+_INDEX_RE = re.compile(r'^\[?(\d+)[\]|](.*)')
+
 # Select the Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
+model = genai.GenerativeModel('gemini-2.0-flash', system_instruction=GUIDELINES)
 
 # Hardcoded input and output file paths
 INPUT_FILE = 'input.json'
 OUTPUT_FILE = 'output.json'
 
-def process_entire_json(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    print(f"Found {len(data)} entries to translate.")
-
-    # Format all texts as a single prompt for Gemini
-    texts_to_translate = [item["text"] for item in data]
-    texts_with_indices = [f"[{i+1}] {text}" for i, text in enumerate(texts_to_translate)]
-
-    # Using triple quotes with regular string, then format it to avoid f-string backslash issues
-    prompt = """
-    Translate the following English texts to natural, conversational Hinglish (Hindi-English mix).
+# Persistent cache of earlier translations, keyed by sha256 of the source text
+CACHE_FILE = 'translation_cache.sqlite'
 
-    Guidelines:
-    1. Keep translations natural sounding, not robotic or literal
-    2. important : Convert numbers or numerical values to words in 'hindi' words.
-    3. Maintain English words that are commonly used in Hinglish conversation
-    4. Consider context between sentences for a natural flow
-    5. The output should feel like a casual conversation between Indians
+# Batching settings for the Gemini API
+BATCH_SIZE = 25           # max texts per request
+MAX_CONCURRENCY = 8       # simultaneous in-flight requests (keep under your QPM tier)
+MAX_CHUNK_TOKENS = 6000   # rough input-token budget per request
 
-    For each text below, provide the Hinglish translation. Maintain the numbering format exactly as [1], [2], etc.
-
-    {0}
-
-    Return ONLY the translated texts with their corresponding numbers in this exact format:
-    [1] <Hinglish translation>
-    [2] <Hinglish translation>
-    ...
-
-    Do not include any explanations, only the numbered translations.
+def _estimate_tokens(s):
     """
+    Cheap token-count heuristic (~4 characters per token); avoids paying for
+    API token-count calls.
+    """
+    return len(s) // 4
 
-    # Format the prompt after definition to avoid f-string backslash issues
-    prompt = prompt.format('\n\n'.join(texts_with_indices))
-
-    # Get translation from Gemini
-    print("Sending request to Gemini API...")
-    start_time = time.time()
-    response = model.generate_content(prompt)
-    translated_text = response.text.strip()
-    end_time = time.time()
-
-    print(f"Got response from API in {end_time - start_time:.2f} seconds.")
-
-    # Parse the response to extract individual translations
-    lines = translated_text.split('\n')
-    translations = []
+def _pack_chunks(data):
+    """
+    Greedily pack items into chunks capped at BATCH_SIZE items and roughly
+    MAX_CHUNK_TOKENS input tokens, so one oversized prompt can't blow the
+    context window or truncate the response mid-array.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for item in data:
+        tokens = _estimate_tokens(item["text"])
+        if current and (len(current) >= BATCH_SIZE or current_tokens + tokens > MAX_CHUNK_TOKENS):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _cache_connect():
+    conn = sqlite3.connect(CACHE_FILE)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS translations "
+        "(sha256 TEXT PRIMARY KEY, hinglish TEXT, ts INTEGER)"
+    )
+    return conn
+
+def _cache_lookup(conn, texts):
+    """
+    Return a {source text: hinglish} dict for every text already in the cache.
+    """
+    hashes = {hashlib.sha256(t.encode()).hexdigest(): t for t in texts}
+    hash_list = list(hashes)
+    found = {}
+
+    # SQLite caps the number of placeholders per statement, so query in slices
+    for i in range(0, len(hash_list), 500):
+        chunk = hash_list[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(
+            f"SELECT sha256, hinglish FROM translations WHERE sha256 IN ({placeholders})",
+            chunk,
+        )
+        for h, hinglish in rows:
+            found[hashes[h]] = hinglish
+
+    return found
+
+def _cache_store(conn, pairs):
+    """
+    Store (source text, hinglish) pairs in the cache, skipping empty
+    translations so failures are retried instead of served as hits.
+    """
+    now = int(time.time())
+    conn.executemany(
+        "INSERT OR REPLACE INTO translations (sha256, hinglish, ts) VALUES (?, ?, ?)",
+        [(hashlib.sha256(text.encode()).hexdigest(), hinglish, now)
+         for text, hinglish in pairs if hinglish],
+    )
+    conn.commit()
+
+def _parse_numbered(text, count, offset):
+    """
+    Fallback parser for responses that ignore the JSON schema and come back
+    as '[i] translation' lines instead.
+    """
+    translations = [""] * count
     current_index = None
-    current_text = ""
+    current_parts = []
 
-    for line in lines:
+    for line in text.split('\n'):
         line = line.strip()
         if not line:
             continue
 
-        # Check if this line starts a new translation
-        index_match = re.match(r'^\[(\d+)\](.*)', line)
+        index_match = _INDEX_RE.match(line)
         if index_match:
             # If we have a previous translation, save it
-            if current_index is not None:
-                translations.append((current_index, current_text.strip()))
+            if current_index is not None and 0 <= current_index < count:
+                translations[current_index] = ' '.join(current_parts).strip()
 
             # Start a new translation
-            current_index = int(index_match.group(1))
-            current_text = index_match.group(2).strip()
+            current_index = int(index_match.group(1)) - offset - 1
+            current_parts = [index_match.group(2).strip()]
         else:
             # Continue the current translation
-            current_text += " " + line
+            current_parts.append(line)
 
     # Add the last translation
-    if current_index is not None:
-        translations.append((current_index, current_text.strip()))
+    if current_index is not None and 0 <= current_index < count:
+        translations[current_index] = ' '.join(current_parts).strip()
+
+    return translations
+
+def _single_translation(text):
+    """
+    Extract the translation from a single-item fast-path response. The system
+    instruction asks for JSON arrays, so the model may wrap the answer in one
+    despite the plain-text prompt; unwrap it rather than storing it verbatim.
+    """
+    try:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return text.strip()
 
-    # Verify we got all translations
-    if len(translations) != len(data):
-        print(f"Warning: Expected {len(data)} translations but got {len(translations)}.")
+    if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], str):
+        return parsed[0].strip()
+    if isinstance(parsed, str):
+        return parsed.strip()
+    return text.strip()
 
-    # Sort translations by index
-    translations.sort(key=lambda x: x[0])
+async def translate_batch(model, batch, offset):
+    """
+    Translate one batch of texts, numbering each entry by its global index.
+    Returns the list of Hinglish translations in input order.
+    """
+    prompt = '\n'.join(f"{offset + i + 1}|{item['text']}" for i, item in enumerate(batch))
+
+    # Stream the response so transfer overlaps with accumulation instead of
+    # blocking on the full generation
+    response = await model.generate_content_async(
+        prompt, generation_config=GENERATION_CONFIG, stream=True
+    )
+    parts = []
+    async for chunk in response:
+        parts.append(chunk.text)
+    text = ''.join(parts)
+
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return _parse_numbered(text, len(batch), offset)
 
-    # Create output data
-    output_data = []
-    for idx, trans_text in translations:
-        if 1 <= idx <= len(data):
-            output_data.append({"text": trans_text})
+async def process_entire_json(input_file, output_file):
+    with open(input_file, 'rb') as f:
+        data = orjson.loads(f.read())
 
-    # If we're missing any translations, fill with placeholders
-    if len(output_data) < len(data):
-        for i in range(len(output_data), len(data)):
-            output_data.append({"text": f"[Translation missing for: {data[i]['text']}]"})
+    print(f"Found {len(data)} entries to translate.")
+
+    # Reuse earlier translations from the cache and only send the misses;
+    # repeated lines are deduplicated so each unique text is translated once
+    # and fanned back out through the text -> hinglish mapping
+    conn = _cache_connect()
+    texts = [item["text"] for item in data]
+    translated = _cache_lookup(conn, texts)
+    misses = [{"text": text} for text in dict.fromkeys(texts) if text not in translated]
+
+    print(f"{len(translated)} cache hit(s), {len(misses)} unique entries to translate.")
+
+    if len(misses) == 1:
+        # Single item: one plain round-trip, no numbering or batching overhead
+        print("Sending single request to Gemini API...")
+        start_time = time.time()
+        response = await model.generate_content_async(SIMPLE_PROMPT + misses[0]["text"])
+        translations = [_single_translation(response.text)]
+        end_time = time.time()
+
+        print(f"Got response from API in {end_time - start_time:.2f} seconds.")
+
+        _cache_store(conn, [(misses[0]["text"], translations[0])])
+        translated[misses[0]["text"]] = translations[0]
+    elif misses:
+        # Pack the misses into token-bounded batches and fire them
+        # concurrently, capped by a semaphore so we stay inside the API
+        # rate limits
+        chunks = _pack_chunks(misses)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def sem_wrap(coro):
+            async with semaphore:
+                return await coro
+
+        # Global numbering offset of each chunk's first item
+        offsets = []
+        total = 0
+        for chunk in chunks:
+            offsets.append(total)
+            total += len(chunk)
+
+        print(f"Sending {len(chunks)} concurrent request(s) to Gemini API...")
+        start_time = time.time()
+        batch_results = await asyncio.gather(
+            *[sem_wrap(translate_batch(model, chunk, offset)) for chunk, offset in zip(chunks, offsets)]
+        )
+        end_time = time.time()
 
-    # Write output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+        print(f"Got all responses from API in {end_time - start_time:.2f} seconds.")
+
+        # Flatten per-batch arrays in one pass; gather preserves submission
+        # order, and each batch is normalized to its expected length so a
+        # short response cannot shift later entries out of position. Empty
+        # strings (a truncated response the fallback parser couldn't match)
+        # count as missing too, so they get a placeholder instead of
+        # silently landing in the output and the cache.
+        translations = []
+        missing = 0
+        for chunk, result in zip(chunks, batch_results):
+            result = result[:len(chunk)]
+            for item, text in zip(chunk, result):
+                text = text.strip()
+                if text:
+                    translations.append(text)
+                else:
+                    missing += 1
+                    translations.append(f"[Translation missing for: {item['text']}]")
+            missing += len(chunk) - len(result)
+            translations.extend(
+                f"[Translation missing for: {item['text']}]" for item in chunk[len(result):]
+            )
+
+        if missing:
+            print(f"Warning: {missing} translation(s) missing; placeholders inserted.")
+
+        new_pairs = list(zip((item["text"] for item in misses), translations))
+        # Don't cache placeholders, so missing entries are retried next run
+        _cache_store(conn, [(text, hinglish) for text, hinglish in new_pairs
+                            if not hinglish.startswith("[Translation missing")])
+        translated.update(new_pairs)
+
+    conn.close()
+
+    output_data = [{"text": translated.get(text, "")} for text in texts]
+
+    # Write output file (orjson emits UTF-8 bytes, no ensure_ascii needed)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
 
     print(f"Successfully processed translations and saved to {output_file}")
     return output_data
@@ -129,8 +316,8 @@ def create_sample_input():
 
     sample_data = [{"text": text} for text in sample_texts]
 
-    with open(INPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(sample_data, f, ensure_ascii=False, indent=2)
+    with open(INPUT_FILE, 'wb') as f:
+        f.write(orjson.dumps(sample_data, option=orjson.OPT_INDENT_2))
 
     print(f"Created sample input file with {len(sample_texts)} entries.")
     return INPUT_FILE
@@ -158,7 +345,7 @@ def main():
             return
 
         start_time = time.time()
-        process_entire_json(INPUT_FILE, OUTPUT_FILE)
+        asyncio.run(process_entire_json(INPUT_FILE, OUTPUT_FILE))
         end_time = time.time()
 
         print(f"\nProcessing completed in {end_time - start_time:.2f} seconds.")
@@ -1,15 +1,32 @@
-import json
+import asyncio
+import functools
+import io
+import orjson
 import re
+import tempfile
 import time
 import os
+import uuid
 import streamlit as st
 import google.generativeai as genai
 import pandas as pd
 from dotenv import load_dotenv
 
-load_dotenv()  # Load variables from .env
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_pq
+except ImportError:
+    pa = None
 
-api_key = os.getenv("API_KEY")
+@functools.lru_cache(maxsize=1)
+def _load_env():
+    """
+    Load .env once per process; Streamlit reruns the whole script on every
+    interaction and would otherwise re-stat and re-parse the file each time.
+    """
+    load_dotenv()
+    return os.getenv("API_KEY")
 
 # Set page configuration with wider layout
 st.set_page_config(
@@ -55,99 +72,328 @@ with st.sidebar:
     st.markdown("---")
     st.caption("DubFlix © 2025")
 
-# Configure the Gemini API
+# Sent once as the system instruction so the guidelines are not resent
+# (and re-billed) with every batch request
+GUIDELINES = """
+You translate English texts to natural, conversational Hinglish (Hindi-English mix).
+
+Guidelines:
+1. Keep translations natural sounding, not robotic or literal
+2. important : Convert numbers or numerical values to words in 'hindi' words.
+3. Maintain English words that are commonly used in Hinglish conversation
+4. Consider context between sentences for a natural flow
+5. The output should feel like a casual conversation between Indians
+
+The input is one text per line in the format i|text, where i is the text's number.
+Return a JSON array of the Hinglish translations, one per input line, in the same order.
+"""
+
+# Ask Gemini for a parsed JSON array of strings so no response parsing is
+# needed; the SDK converts the list[str] annotation to the response schema
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": list[str],
+}
+
+# Single-item requests skip the numbering/JSON machinery entirely
+SIMPLE_PROMPT = (
+    "Translate the following single text to Hinglish and reply with only the "
+    "translation as plain text, not JSON:\n"
+)
+
+# Configure the Gemini API; env is read here so it happens once per session,
+# not at the top of every rerun
 @st.cache_resource
 def get_model():
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-2.0-flash')
+    genai.configure(api_key=_load_env())
+    return genai.GenerativeModel('gemini-2.0-flash', system_instruction=GUIDELINES)
 
-def process_json(data):
-    model = get_model()
-    
-    # Format all texts as a single prompt for Gemini
-    texts_to_translate = [item["text"] for item in data]
-    texts_with_indices = [f"[{i+1}] {text}" for i, text in enumerate(texts_to_translate)]
-    
-    prompt = """
-    Translate the following English texts to natural, conversational Hinglish (Hindi-English mix).
-    
-    Guidelines:
-    1. Keep translations natural sounding, not robotic or literal
-    2. important : Convert numbers or numerical values to words in 'hindi' words. 
-    3. Maintain English words that are commonly used in Hinglish conversation
-    4. Consider context between sentences for a natural flow
-    5. The output should feel like a casual conversation between Indians
-    
-    For each text below, provide the Hinglish translation. Maintain the numbering format exactly as [1], [2], etc.
-    
-    {0}
-    
-    Return ONLY the translated texts with their corresponding numbers in this exact format:
-    [1] <Hinglish translation>
-    [2] <Hinglish translation>
-    ...
-    
-    Do not include any explanations, only the numbered translations.
+# Resolve the cached model once per rerun instead of inside every call
+model = get_model()
+
+# Batching settings for the Gemini API
+BATCH_SIZE = 25           # max texts per request
+MAX_CONCURRENCY = 8       # simultaneous in-flight requests (keep under your QPM tier)
+MAX_CHUNK_TOKENS = 6000   # rough input-token budget per request
+
+def _estimate_tokens(s):
     """
-    
-    prompt = prompt.format('\n\n'.join(texts_with_indices))
-    
-    with st.spinner("🔄 Translating with Gemini AI..."):
-        progress_bar = st.progress(0)
-        start_time = time.time()
-        response = model.generate_content(prompt)
-        translated_text = response.text.strip()
-        end_time = time.time()
-        translation_time = end_time - start_time
-        st.session_state.translation_time = translation_time
-        progress_bar.progress(100)
-    
-    st.success(f"✅ Translation completed in {translation_time:.2f} seconds!")
-    
-    # Parse the response to extract individual translations
-    lines = translated_text.split('\n')
-    translations = []
+    Cheap token-count heuristic (~4 characters per token); avoids paying for
+    API token-count calls.
+    """
+    return len(s) // 4
+
+def _pack_chunks(data):
+    """
+    Greedily pack items into chunks capped at BATCH_SIZE items and roughly
+    MAX_CHUNK_TOKENS input tokens, so one oversized prompt can't blow the
+    context window or truncate the response mid-array.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for item in data:
+        tokens = _estimate_tokens(item["text"])
+        if current and (len(current) >= BATCH_SIZE or current_tokens + tokens > MAX_CHUNK_TOKENS):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Compiled once for the fallback parser below; matches both the '[i] text'
+# output format and the 'i|text' numbering the prompts use, since a model
+# that ignores the JSON schema may echo either
+_INDEX_RE = re.compile(r'^\[?(\d+)[\]|](.*)')
+
+def _parse_numbered(text, count, offset):
+    """
+    Fallback parser for responses that ignore the JSON schema and come back
+    as '[i] translation' lines instead.
+    """
+    translations = [""] * count
     current_index = None
-    current_text = ""
-    
-    for line in lines:
+    current_parts = []
+
+    for line in text.split('\n'):
         line = line.strip()
         if not line:
             continue
-            
-        # Check if this line starts a new translation
-        index_match = re.match(r'^\[(\d+)\](.*)', line)
+
+        index_match = _INDEX_RE.match(line)
         if index_match:
             # If we have a previous translation, save it
-            if current_index is not None:
-                translations.append((current_index, current_text.strip()))
-            
+            if current_index is not None and 0 <= current_index < count:
+                translations[current_index] = ' '.join(current_parts).strip()
+
             # Start a new translation
-            current_index = int(index_match.group(1))
-            current_text = index_match.group(2).strip()
+            current_index = int(index_match.group(1)) - offset - 1
+            current_parts = [index_match.group(2).strip()]
         else:
             # Continue the current translation
-            current_text += " " + line
-    
+            current_parts.append(line)
+
     # Add the last translation
-    if current_index is not None:
-        translations.append((current_index, current_text.strip()))
-    
-    # Sort translations by index
-    translations.sort(key=lambda x: x[0])
-    
-    # Create output data
-    output_data = []
-    for idx, trans_text in translations:
-        if 1 <= idx <= len(data):
-            output_data.append({"text": trans_text})
-    
-    # If we're missing any translations, fill with placeholders
-    if len(output_data) < len(data):
-        for i in range(len(output_data), len(data)):
-            output_data.append({"text": f"[Translation missing for: {data[i]['text']}]"})
-    
-    return output_data
+    if current_index is not None and 0 <= current_index < count:
+        translations[current_index] = ' '.join(current_parts).strip()
+
+    return translations
+
+def _single_translation(text):
+    """
+    Extract the translation from a single-item fast-path response. The system
+    instruction asks for JSON arrays, so the model may wrap the answer in one
+    despite the plain-text prompt; unwrap it rather than storing it verbatim.
+    """
+    try:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return text.strip()
+
+    if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], str):
+        return parsed[0].strip()
+    if isinstance(parsed, str):
+        return parsed.strip()
+    return text.strip()
+
+async def translate_batch(model, batch, offset, on_progress=None):
+    """
+    Translate one batch of texts, numbering each entry by its global index.
+    Returns the list of Hinglish translations in input order. If on_progress
+    is given it is called with the number of items completed so far.
+    """
+    prompt = '\n'.join(f"{offset + i + 1}|{item['text']}" for i, item in enumerate(batch))
+
+    # Stream the response so transfer overlaps with accumulation instead of
+    # blocking on the full generation
+    response = await model.generate_content_async(
+        prompt, generation_config=GENERATION_CONFIG, stream=True
+    )
+    parts = []
+    done = 0
+    async for chunk in response:
+        parts.append(chunk.text)
+        if on_progress is not None:
+            # Count item terminators in the streamed JSON array; an estimate,
+            # but good enough to tick the progress bar per completed item
+            done = min(len(batch), done + chunk.text.count('",') + chunk.text.count('"]'))
+            on_progress(done)
+    text = ''.join(parts)
+
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return _parse_numbered(text, len(batch), offset)
+
+async def translate_all_batches(model, data, on_progress=None):
+    chunks = _pack_chunks(data)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    done_counts = [0] * len(chunks)
+
+    # Global numbering offset of each chunk's first item
+    offsets = []
+    total = 0
+    for chunk in chunks:
+        offsets.append(total)
+        total += len(chunk)
+
+    def batch_progress(batch_index):
+        def update(done):
+            done_counts[batch_index] = done
+            on_progress(sum(done_counts), len(data))
+        return update
+
+    async def sem_wrap(i, chunk):
+        async with semaphore:
+            return await translate_batch(
+                model, chunk, offsets[i],
+                batch_progress(i) if on_progress is not None else None,
+            )
+
+    batch_results = await asyncio.gather(*[sem_wrap(i, chunk) for i, chunk in enumerate(chunks)])
+
+    # Flatten per-batch arrays in one pass; gather preserves submission order,
+    # and each batch is normalized to its expected length so a short response
+    # cannot shift later entries out of position. Empty strings (a truncated
+    # response the fallback parser couldn't match) count as missing too.
+    translations = []
+    for chunk, result in zip(chunks, batch_results):
+        result = result[:len(chunk)]
+        for item, text in zip(chunk, result):
+            text = text.strip()
+            translations.append(text if text else f"[Translation missing for: {item['text']}]")
+        translations.extend(
+            f"[Translation missing for: {item['text']}]" for item in chunk[len(result):]
+        )
+    return translations
+
+@st.cache_data(show_spinner=False)
+def translate_texts(texts, _progress_bar=None):
+    """
+    Translate a tuple of texts. Memoized on the input texts, so re-translating
+    an unchanged (or partially overlapping, per rerun) upload skips the API.
+    The underscore-prefixed progress bar is excluded from the cache key.
+    """
+    # Repeated lines are translated once and fanned back out by mapping
+    uniques = list(dict.fromkeys(texts))
+
+    if len(uniques) == 1:
+        # Single item: one plain round-trip, no numbering or batching overhead
+        response = model.generate_content(SIMPLE_PROMPT + uniques[0])
+        mapping = {uniques[0]: _single_translation(response.text)}
+    else:
+        data = [{"text": text} for text in uniques]
+
+        def on_progress(done, total):
+            if _progress_bar is not None:
+                _progress_bar.progress(min(1.0, done / total))
+
+        translations = asyncio.run(translate_all_batches(model, data, on_progress))
+        mapping = dict(zip(uniques, translations))
+
+    return [mapping[text] for text in texts]
+
+def process_json(data):
+    texts = tuple(item["text"] for item in data)
+
+    with st.spinner("🔄 Translating with Gemini AI..."):
+        progress_bar = st.progress(0.0)
+        start_time = time.time()
+        translations = translate_texts(texts, _progress_bar=progress_bar)
+        end_time = time.time()
+        translation_time = end_time - start_time
+        st.session_state.translation_time = translation_time
+        progress_bar.progress(1.0)
+
+    # Don't keep placeholder or empty results memoized: evict this entry so
+    # clicking Translate again retries the batch instead of replaying the
+    # failure (same policy as the CLI's sqlite cache)
+    if any(not text or text.startswith("[Translation missing") for text in translations):
+        translate_texts.clear(texts)
+
+    st.success(f"✅ Translation completed in {translation_time:.2f} seconds!")
+
+    return [{"text": text} for text in translations]
+
+@st.cache_data(show_spinner=False)
+def build_preview_df(raw_bytes):
+    """
+    Build the input-preview table, memoized on the uploaded bytes so widget
+    reruns don't reconstruct it while the file is unchanged.
+    """
+    data = orjson.loads(raw_bytes)
+    # Columnar construction skips pandas' slow dict-per-row path
+    return pd.DataFrame({
+        "Index": range(1, len(data) + 1),
+        "English Text": [item["text"] for item in data],
+    })
+
+def dataframe_to_csv_bytes(df):
+    """
+    Serialize a DataFrame straight to UTF-8 CSV bytes, using pyarrow's C
+    writer when available; avoids the extra str -> bytes copy made by
+    df.to_csv().encode().
+    """
+    buf = io.BytesIO()
+    if pa is not None:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    else:
+        df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def build_comparison_df(english, hinglish):
+    """
+    Build the side-by-side results table, memoized on the text tuples.
+    """
+    # Columnar construction skips pandas' slow dict-per-row path
+    return pd.DataFrame({
+        "№": range(1, min(len(english), len(hinglish)) + 1),
+        "English": list(english[:len(hinglish)]),
+        "Hinglish": list(hinglish[:len(english)]),
+    })
+
+def store_output(output_data):
+    """
+    Persist translation results to a per-session parquet file and keep only
+    its path in session state, so reruns don't keep copying the full result
+    list through widget state. Falls back to session state without pyarrow.
+    """
+    if pa is None:
+        st.session_state.output_data = output_data
+        return
+
+    if '_session_suffix' not in st.session_state:
+        st.session_state._session_suffix = uuid.uuid4().hex
+    path = os.path.join(
+        tempfile.gettempdir(), f"dubflix_{st.session_state._session_suffix}.parquet"
+    )
+    pa_pq.write_table(pa.table({"text": [item["text"] for item in output_data]}), path)
+    st.session_state.output_path = path
+
+@st.cache_data(show_spinner=False)
+def _load_output(path, mtime):
+    # mtime is part of the cache key so a rewritten file invalidates the entry
+    return pa_pq.read_table(path).column("text").to_pylist()
+
+def get_output_texts():
+    """
+    Return the Hinglish texts stored for this session, or None if there are
+    no results yet.
+    """
+    if pa is None:
+        output_data = st.session_state.get('output_data')
+        return [item["text"] for item in output_data] if output_data else None
+
+    path = st.session_state.get('output_path')
+    if not path or not os.path.exists(path):
+        return None
+    return _load_output(path, os.path.getmtime(path))
 
 # Create tabs with better styling
 tabs = st.tabs(["🔄 Translate", "📊 Results", "ℹ️ About"])
@@ -165,35 +411,39 @@ with tabs[0]:
             help="JSON should contain an array of objects with 'text' property"
         )
     
+    # Parse the upload exactly once per file and keep it in session state;
+    # getvalue() returns the buffered bytes, so a second look at the file
+    # can't hit EOF from an earlier read. Keyed on file_id, not name, so
+    # re-uploading an edited file with the same filename is re-parsed.
+    if uploaded_file and st.session_state.get('_uploaded_file_id') != uploaded_file.file_id:
+        try:
+            st.session_state.input_data = orjson.loads(uploaded_file.getvalue())
+            st.session_state._uploaded_file_id = uploaded_file.file_id
+        except orjson.JSONDecodeError as e:
+            st.error(f"Invalid JSON format: {str(e)}")
+
     with upload_col2:
         st.markdown("<br>", unsafe_allow_html=True)
-        if uploaded_file:
+        if uploaded_file and 'input_data' in st.session_state:
             if st.button("🚀 Translate", type="primary", use_container_width=True):
                 try:
-                    input_data = json.load(uploaded_file)
-                    st.session_state.input_data = input_data
-                    
                     with st.spinner("Processing..."):
-                        output_data = process_json(input_data)
-                        st.session_state.output_data = output_data
+                        output_data = process_json(st.session_state.input_data)
+                        store_output(output_data)
                         st.session_state.tab_index = 1  # Switch to results tab
                         st.rerun()
-                
+
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
-    
+
     # Display input data preview if file is uploaded
-    if uploaded_file:
+    if uploaded_file and 'input_data' in st.session_state:
         try:
-            if 'input_data' not in st.session_state:
-                st.session_state.input_data = json.load(uploaded_file)
-            
             st.markdown("### 📝 Preview Input Data")
-            
+
             # Create a more visually appealing dataframe
-            input_df = pd.DataFrame([{"Index": i+1, "English Text": item["text"]} 
-                                   for i, item in enumerate(st.session_state.input_data)])
-            
+            input_df = build_preview_df(uploaded_file.getvalue())
+
             st.dataframe(
                 input_df,
                 use_container_width=True,
@@ -219,23 +469,19 @@ with tabs[0]:
             {"text": "What's your name? I'm John."},
             {"text": "The price is $50 for this product."}
         ]
-        st.code(json.dumps(sample, indent=2))
+        st.code(orjson.dumps(sample, option=orjson.OPT_INDENT_2).decode())
 
 with tabs[1]:
-    if 'output_data' in st.session_state and st.session_state.output_data:
+    output_texts = get_output_texts()
+    if output_texts:
         st.markdown("### 🎯 Translation Results")
-        
+
         # Display side-by-side comparison
         if 'input_data' in st.session_state:
-            comparison_data = []
-            for i, (inp, out) in enumerate(zip(st.session_state.input_data, st.session_state.output_data)):
-                comparison_data.append({
-                    "№": i+1,
-                    "English": inp["text"],
-                    "Hinglish": out["text"]
-                })
-            
-            comparison_df = pd.DataFrame(comparison_data)
+            comparison_df = build_comparison_df(
+                tuple(item["text"] for item in st.session_state.input_data),
+                tuple(output_texts),
+            )
             st.dataframe(
                 comparison_df, 
                 use_container_width=True, 
@@ -260,7 +506,10 @@ with tabs[1]:
             dl_col1, dl_col2 = st.columns(2)
             
             with dl_col1:
-                output_json = json.dumps(st.session_state.output_data, ensure_ascii=False, indent=2)
+                # orjson emits UTF-8 bytes, which st.download_button accepts directly
+                output_json = orjson.dumps(
+                    [{"text": text} for text in output_texts], option=orjson.OPT_INDENT_2
+                )
                 st.download_button(
                     label="💾 Download Translated JSON",
                     data=output_json,
@@ -271,7 +520,7 @@ with tabs[1]:
             
             with dl_col2:
                 # Export as CSV option
-                csv_data = comparison_df.to_csv(index=False).encode('utf-8')
+                csv_data = dataframe_to_csv_bytes(comparison_df)
                 st.download_button(
                     label="📊 Export as CSV",
                     data=csv_data,